@@ -11,7 +11,7 @@ from sqlalchemy import util as sa_util
 from sqlalchemy.engine import default, reflection
 from sqlalchemy.sql import compiler, expression
 from sqlalchemy.sql.elements import quoted_name
-from sqlalchemy.dialects.postgresql.base import PGCompiler, PGIdentifierPreparer
+from sqlalchemy.schema import DDLElement
 from sqlalchemy.types import (
     CHAR, DATE, DATETIME, INTEGER, SMALLINT, BIGINT, DECIMAL, TIME,
     TIMESTAMP, VARCHAR, BINARY, BOOLEAN, FLOAT, REAL)
@@ -49,7 +49,24 @@ ischema_names = {
     'Decimal': DECIMAL,
 }
 
-class ClickHouseIdentifierPreparer(PGIdentifierPreparer):
+# DDL constructs
+class CreateTemporaryTableAs(DDLElement):
+    """ CREATE TEMPORARY TABLE ... AS SELECT, the table lives until the end of the session. """
+    __visit_name__ = 'create_temporary_table_as'
+
+    def __init__(self, name, selectable, if_not_exists=False):
+        self.name = name
+        self.selectable = selectable
+        self.if_not_exists = if_not_exists
+
+class DropTemporaryTable(DDLElement):
+    __visit_name__ = 'drop_temporary_table'
+
+    def __init__(self, name, if_exists=False):
+        self.name = name
+        self.if_exists = if_exists
+
+class ClickHouseIdentifierPreparer(compiler.IdentifierPreparer):
     def quote_identifier(self, value):
         """ Never quote identifiers. """
         return self._escape_identifier(value)
@@ -58,7 +75,7 @@ class ClickHouseIdentifierPreparer(PGIdentifierPreparer):
             return '"{}"'.format(ident)
         return ident
 
-class ClickHouseCompiler(PGCompiler):
+class ClickHouseCompiler(compiler.SQLCompiler):
     def visit_count_func(self, fn, **kw):
         return 'count{0}'.format(self.process(fn.clause_expr, **kw))
 
@@ -95,6 +112,27 @@ class ClickHouseCompiler(PGCompiler):
     def visit_concat_op_binary(self, binary, operator, **kw):
         return "concat(%s, %s)" % (self.process(binary.left), self.process(binary.right))
 
+    def visit_ilike_op_binary(self, binary, operator, **kw):
+        return '%s ILIKE %s' % (
+            self.process(binary.left, **kw),
+            self.process(binary.right, **kw)
+        )
+
+    def visit_notilike_op_binary(self, binary, operator, **kw):
+        return '%s NOT ILIKE %s' % (
+            self.process(binary.left, **kw),
+            self.process(binary.right, **kw)
+        )
+
+    # SQLAlchemy 1.4 renamed notilike_op
+    visit_not_ilike_op_binary = visit_notilike_op_binary
+
+    def visit_getitem_binary(self, binary, operator, **kw):
+        return '%s[%s]' % (
+            self.process(binary.left, **kw),
+            self.process(binary.right, **kw)
+        )
+
     def visit_in_op_binary(self, binary, operator, **kw):
         kw['literal_binds'] = True
         return '%s IN %s' % (
@@ -117,12 +155,25 @@ class ClickHouseCompiler(PGCompiler):
 
     def render_literal_value(self, value, type_):
         value = super(ClickHouseCompiler, self).render_literal_value(value, type_)
+        if self.dialect._backslash_escapes:
+            value = value.replace('\\', '\\\\')
         if isinstance(type_, sqltypes.DateTime):
             value = 'toDateTime(%s)' % value
         if isinstance(type_, sqltypes.Date):
             value = 'toDate(%s)' % value
         return value
 
+    def get_select_precolumns(self, select, **kw):
+        # SQLAlchemy < 1.4 keeps the DISTINCT ON expressions in _distinct
+        distinct_on = getattr(select, '_distinct_on', None)
+        if not distinct_on and isinstance(select._distinct, (list, tuple)):
+            distinct_on = select._distinct
+        if distinct_on:
+            return 'DISTINCT ON (%s) ' % ', '.join(self.process(col, **kw) for col in distinct_on)
+        if select._distinct:
+            return 'DISTINCT '
+        return ''
+
     def limit_clause(self, select, **kw):
         text = ''
         if select._limit_clause is not None:
@@ -139,6 +190,24 @@ class ClickHouseCompiler(PGCompiler):
     def for_update_clause(self, select, **kw):
         return '' # Not supported
 
+class ClickHouseDDLCompiler(compiler.DDLCompiler):
+    def visit_create_temporary_table_as(self, create, **kw):
+        select = self.sql_compiler.process(create.selectable, literal_binds=True)
+        if self.preparer._double_percents:
+            # DDL is executed without parameters, so percent signs are sent as is
+            select = select.replace('%%', '%')
+        return 'CREATE TEMPORARY TABLE %s%s AS %s' % (
+            'IF NOT EXISTS ' if create.if_not_exists else '',
+            self.preparer.quote(create.name),
+            select
+        )
+
+    def visit_drop_temporary_table(self, drop, **kw):
+        return 'DROP TEMPORARY TABLE %s%s' % (
+            'IF EXISTS ' if drop.if_exists else '',
+            self.preparer.quote(drop.name)
+        )
+
 class ClickHouseExecutionContext(default.DefaultExecutionContext):
     @sa_util.memoized_property
     def should_autocommit(self):
@@ -173,9 +242,10 @@ class ClickHouseDialect(default.DefaultDialect):
     preparer = ClickHouseIdentifierPreparer
     type_compiler = ClickHouseTypeCompiler
     statement_compiler = ClickHouseCompiler
+    ddl_compiler = ClickHouseDDLCompiler
     execution_ctx_cls = ClickHouseExecutionContext
 
-    # Required for PG-based compiler
+    # Escape backslashes in rendered literals
     _backslash_escapes = True
 
     @classmethod
@@ -195,6 +265,11 @@ class ClickHouseDialect(default.DefaultDialect):
         kwargs.update(url.query)
         return ([url.database or 'default'], kwargs)
 
+    def do_execute(self, cursor, statement, parameters, context=None):
+        # DDL statements don't return a result set
+        is_response = context is None or not context.isddl
+        cursor.execute(statement, parameters, is_response=is_response)
+
     def _get_default_schema_name(self, connection):
         return connection.scalar("select currentDatabase()")
 
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+#
+# Measure how long it takes to import the connector and the dialect in a fresh interpreter,
+# and check that the HTTP/ORM stack is only loaded on first connect.
+#
+# Usage: python bench_import.py [repeat]
+
+from __future__ import print_function
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ('requests', 'six', 'infi.clickhouse_orm', 'sqlalchemy.dialects.postgresql')
+
+SNIPPET = '''
+import sys, time
+start = time.time()
+import %s
+elapsed = time.time() - start
+loaded = [m for m in %r if m in sys.modules]
+print('%%f %%s' %% (elapsed, ','.join(loaded)))
+'''
+
+def measure(module, repeat):
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings, loaded = [], ''
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', SNIPPET % (module, LAZY_MODULES)], cwd=here)
+        elapsed, _, loaded = out.decode('utf-8').strip().partition(' ')
+        timings.append(float(elapsed))
+    timings.sort()
+    return timings[0], timings[len(timings) // 2], loaded
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for module in ('connector', 'base'):
+        best, median, loaded = measure(module, repeat)
+        print('import %-10s best %7.2f ms  median %7.2f ms  eagerly loaded: %s' % (
+            module, best * 1000, median * 1000, loaded or '-'))
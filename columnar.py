@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+#
+# Columnar encoders used by Cursor.insert_columns and Cursor.insert_dataframe.
+#
+# Columns are encoded a chunk at a time, so the encoded copy never holds more than
+# ``chunk_size`` rows. NumPy is required, pandas and pyarrow only for their respective inputs.
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+import re
+from datetime import datetime
+
+import numpy as np
+
+_NUMERIC_TYPES = {
+    'Int8': '<i1',
+    'Int16': '<i2',
+    'Int32': '<i4',
+    'Int64': '<i8',
+    'UInt8': '<u1',
+    'UInt16': '<u2',
+    'UInt32': '<u4',
+    'UInt64': '<u8',
+    'Float32': '<f4',
+    'Float64': '<f8',
+    'Bool': '<u1',
+}
+
+_RE_ENUM_VALUE = re.compile(r"'((?:[^'\\]|\\.)*)'\s*=\s*(-?\d+)")
+
+def _varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def _string(s):
+    if not isinstance(s, bytes):
+        s = s.encode('utf-8')
+    return _varint(len(s)) + s
+
+def _native_type(db_type):
+    """ Type to declare in a Native block, LowCardinality columns are sent as plain values. """
+    if db_type.startswith('LowCardinality('):
+        return db_type[15:-1]
+    return db_type
+
+def _enum_values(db_type):
+    return dict((name.replace("\\'", "'"), int(value)) for name, value in _RE_ENUM_VALUE.findall(db_type))
+
+def _null_mask(values):
+    kind = values.dtype.kind
+    if kind == 'f':
+        return np.isnan(values)
+    if kind in 'mM':
+        return np.isnat(values)
+    if kind == 'O':
+        return np.fromiter((v is None or v != v for v in values.tolist()), bool, len(values))
+    return np.zeros(len(values), bool)
+
+def _null_default(db_type):
+    if db_type.startswith(('String', 'FixedString')):
+        return ''
+    if db_type.startswith('Date'):
+        return datetime(1970, 1, 1)
+    if db_type.startswith('Enum'):
+        return min(_enum_values(db_type).items(), key=lambda kv: kv[1])[0]
+    return 0
+
+# Range of DateTime64, in seconds: 1900-01-01 00:00:00 to 2299-12-31 23:59:59
+_DATETIME64_RANGE = (-2208988800, 10413791999)
+
+def _ticks(values, unit):
+    return np.asarray(values).astype('datetime64[%s]' % unit).astype('<i8')
+
+def _in_range(ticks, low, high, db_type):
+    # Also rejects NaT, which converts to the smallest int64
+    if len(ticks) and (ticks.min() < low or ticks.max() > high):
+        raise ValueError('Values out of range for %s' % db_type)
+    return ticks
+
+def _encode_integers(values, dtype, db_type):
+    if values.dtype.kind not in 'iub':
+        # NaN and None would end up as arbitrary integers
+        if _null_mask(values).any():
+            raise ValueError('NULL values for %s' % db_type)
+        if values.dtype.kind == 'O':
+            values = np.array(values.tolist())
+    info = np.iinfo(dtype)
+    if len(values) and values.dtype.kind in 'iufO' and (values.min() < info.min or values.max() > info.max):
+        raise ValueError('Values out of range for %s' % db_type)
+    return values.astype(dtype).tobytes()
+
+def _encode_datetime64(values, db_type):
+    precision = int(re.match(r'DateTime64\((\d+)', db_type).group(1))
+    unit, digits = ('s', 0) if precision == 0 else ('ms', 3) if precision <= 3 else ('us', 6) if precision <= 6 else ('ns', 9)
+    low, high = _DATETIME64_RANGE
+    if unit == 'ns':
+        # Nanosecond ticks end in 2262
+        high = min(high, np.iinfo('<i8').max // 10 ** 9)
+    _in_range(_ticks(values, 's'), low, high, db_type)
+    return (_ticks(values, unit) // 10 ** (digits - precision)).tobytes()
+
+def _encode_strings(values):
+    out = bytearray()
+    for v in values.tolist():
+        if v is None:
+            v = b''
+        elif not isinstance(v, bytes):
+            v = ('%s' % v).encode('utf-8')
+        out += _varint(len(v))
+        out += v
+    return bytes(out)
+
+def _encode_column(db_type, values):
+    values = np.asarray(values)
+    if db_type.startswith('Nullable('):
+        inner = db_type[9:-1]
+        mask = _null_mask(values)
+        if mask.any():
+            values = values.copy()
+            values[mask] = _null_default(inner)
+        return mask.astype('<u1').tobytes() + _encode_column(inner, values)
+    if db_type.startswith('Float'):
+        if values.dtype.kind == 'O' and any(v is None for v in values.tolist()):
+            raise ValueError('NULL values for %s' % db_type)
+        return values.astype(_NUMERIC_TYPES[db_type]).tobytes()
+    if db_type in _NUMERIC_TYPES:
+        return _encode_integers(values, _NUMERIC_TYPES[db_type], db_type)
+    if db_type == 'Date':
+        return _in_range(_ticks(values, 'D'), 0, 0xffff, db_type).astype('<u2').tobytes()
+    if db_type == 'Date32':
+        # 1900-01-01 to 2299-12-31
+        return _in_range(_ticks(values, 'D'), -25567, 120529, db_type).astype('<i4').tobytes()
+    if db_type.startswith('DateTime64'):
+        return _encode_datetime64(values, db_type)
+    if db_type.startswith('DateTime'):
+        return _in_range(_ticks(values, 's'), 0, 0xffffffff, db_type).astype('<u4').tobytes()
+    if db_type == 'String':
+        return _encode_strings(values)
+    if db_type.startswith('FixedString'):
+        size = int(db_type[12:-1])
+        encoded = [v if isinstance(v, bytes) else ('%s' % v).encode('utf-8') for v in values.tolist()]
+        if any(len(v) > size for v in encoded):
+            raise ValueError('Values longer than %d bytes for %s' % (size, db_type))
+        return np.array(encoded, dtype='S%d' % size).tobytes()
+    if db_type.startswith('Enum8') or db_type.startswith('Enum16'):
+        dtype = '<i1' if db_type.startswith('Enum8') else '<i2'
+        mapping = _enum_values(db_type)
+        if values.dtype.kind in 'iu':
+            unknown = set(values.tolist()).difference(mapping.values())
+            if unknown:
+                raise ValueError('Unknown values %s for %s' % (', '.join(map(str, sorted(unknown))), db_type))
+            return values.astype(dtype).tobytes()
+        unknown = set(values.tolist()).difference(mapping)
+        if unknown:
+            raise ValueError('Unknown values %s for %s' % (', '.join(sorted(map(repr, unknown))), db_type))
+        return np.fromiter((mapping[v] for v in values.tolist()), dtype, len(values)).tobytes()
+    raise NotImplementedError('No Native encoder for %s' % db_type)
+
+def _check_type(db_type):
+    if db_type.startswith('Nullable('):
+        db_type = db_type[9:-1]
+    if db_type in _NUMERIC_TYPES or db_type in ('Date', 'Date32', 'String'):
+        return
+    if db_type.startswith(('DateTime', 'FixedString', 'Enum8', 'Enum16')):
+        return
+    raise NotImplementedError('No Native encoder for %s' % db_type)
+
+def _has_invalid_values(db_type):
+    """ Whether values may be rejected by the encoder, rather than just converted. """
+    if db_type.startswith('Nullable('):
+        db_type = db_type[9:-1]
+    return db_type in _NUMERIC_TYPES or db_type.startswith(('Date', 'FixedString', 'Enum'))
+
+def encode_block(names, types, arrays):
+    """ Encode equally long columns as one block of the Native format. """
+    rows = len(arrays[0]) if arrays else 0
+    out = [_varint(len(names)), _varint(rows)]
+    for name, db_type, values in zip(names, types, arrays):
+        out.append(_string(name))
+        out.append(_string(db_type))
+        out.append(_encode_column(db_type, values))
+    return b''.join(out)
+
+def array_chunks(arrays, chunk_size):
+    """ Yield slices of at most ``chunk_size`` rows of equally long NumPy arrays. """
+    rows = len(arrays[0]) if arrays else 0
+    for start in range(0, rows, chunk_size):
+        yield [a[start:start + chunk_size] for a in arrays]
+
+def _series_values(series):
+    dtype = series.dtype
+    if getattr(dtype, 'tz', None) is not None:
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    elif dtype.kind not in 'fmM' and series.hasnans:
+        return series.to_numpy(dtype=object, na_value=None)
+    return series.to_numpy()
+
+def frame_chunks(frame, chunk_size):
+    """ Yield the columns of a pandas DataFrame as NumPy arrays, ``chunk_size`` rows at a time. """
+    names = list(frame.columns)
+    for start in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[start:start + chunk_size]
+        yield [_series_values(chunk[name]) for name in names]
+
+def arrow_chunks(table, chunk_size):
+    """ Yield the columns of a pyarrow Table as NumPy arrays, ``chunk_size`` rows at a time. """
+    for start in range(0, table.num_rows, chunk_size):
+        chunk = table.slice(start, chunk_size)
+        yield [chunk.column(i).to_numpy() for i in range(chunk.num_columns)]
+
+def native_blocks(names, types, chunks):
+    """ Check that all columns can be encoded to their types and return a generator of Native
+    blocks. ``chunks`` returns an iterator over the column slices, it is called once for the
+    check and once for encoding, so that nothing is sent if some value would be rejected. """
+    types = [_native_type(t) for t in types]
+    for db_type in types:
+        _check_type(db_type)
+    checked = [i for i, db_type in enumerate(types) if _has_invalid_values(db_type)]
+    if checked:
+        for arrays in chunks():
+            for i in checked:
+                _encode_column(types[i], arrays[i])
+    return (encode_block(names, types, arrays) for arrays in chunks())
+
+class _Sink(object):
+    """ File-like object collecting the bytes written by the Arrow stream writer. """
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+def arrow_stream(batches):
+    """ Yield an Arrow IPC stream (ClickHouse ``ArrowStream`` format) one record batch at a time. """
+    import pyarrow as pa
+    sink = _Sink()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+def arrow_batches(names, arrays, chunk_size):
+    import pyarrow as pa
+    rows = len(arrays[0]) if arrays else 0
+    schema = None
+    for start in range(0, rows, chunk_size):
+        chunk = [a[start:start + chunk_size] for a in arrays]
+        if schema is None:
+            batch = pa.RecordBatch.from_arrays([pa.array(c) for c in chunk], names=names)
+            schema = batch.schema
+        else:
+            batch = pa.RecordBatch.from_arrays([pa.array(c, type=f.type) for c, f in zip(chunk, schema)], schema=schema)
+        yield batch
+
+def arrow_frame_batches(frame, chunk_size):
+    import pyarrow as pa
+    schema = None
+    for start in range(0, len(frame), chunk_size):
+        batch = pa.RecordBatch.from_pandas(frame.iloc[start:start + chunk_size], schema=schema, preserve_index=False)
+        schema = batch.schema
+        yield batch
@@ -6,11 +6,13 @@
 
 from __future__ import absolute_import
 from __future__ import unicode_literals
+import atexit
+import contextlib
 import re
+import threading
+import time
 import uuid
-import requests
-from infi.clickhouse_orm.models import ModelBase
-from infi.clickhouse_orm.database import Database
+import weakref
 from datetime import datetime
 
 # PEP 249 module globals
@@ -65,54 +67,150 @@ class ParamEscaper(object):
 
 _escaper = ParamEscaper()
 
-# Patch ORM library
-@classmethod
-def create_ad_hoc_field(cls, db_type):
-    import infi.clickhouse_orm.fields as orm_fields
+# Output formats writing one row per line, with the number of header lines
+_LINE_FORMATS = {
+    'TabSeparated': 0,
+    'TabSeparatedRaw': 0,
+    'TabSeparatedWithNames': 1,
+    'TabSeparatedWithNamesAndTypes': 2,
+    'TSV': 0,
+    'TSVRaw': 0,
+    'TSVWithNames': 1,
+    'TSVWithNamesAndTypes': 2,
+    'JSONEachRow': 0,
+    'JSONCompactEachRow': 0,
+    'JSONStringsEachRow': 0,
+}
+
+# Exception appended by ClickHouse to a response when a query fails after the first bytes were
+# sent, searched for in the last _STREAM_TAIL bytes of a stream
+_RE_STREAM_EXCEPTION = re.compile(br'(?:^|\n)(Code: \d+\. DB::Exception[^\n]*)')
+_STREAM_TAIL = 1 << 14
+
+#
+# ORM library glue
+#
+# The HTTP/ORM stack (requests, infi.clickhouse_orm, six) is only imported when the first
+# connection is opened, so that importing the connector (and the dialect) stays cheap.
+# Instead of patching the third-party classes globally, the overrides live in private
+# subclasses which are built once, on first use.
+
+_database_class = None
+
+class _NoLock(object):
+    def __enter__(self):
+        pass
 
-    # Enums
-    if db_type.startswith('Enum'):
-        db_type = 'String' # enum.Eum is not comparable
-    # Arrays
-    if db_type.startswith('Array'):
-        inner_field = cls.create_ad_hoc_field(db_type[6 : -1])
-        return orm_fields.ArrayField(inner_field)
-    # FixedString
-    if db_type.startswith('FixedString'):
-        db_type = 'String'
-
-    if db_type == 'LowCardinality(String)':
-        db_type = 'String'
-
-    if db_type.startswith('DateTime'):
-        db_type = 'DateTime'
-
-    if db_type.startswith('Nullable'):
-        inner_field = cls.create_ad_hoc_field(db_type[9 : -1])
-        return orm_fields.NullableField(inner_field)
-   
-    # db_type for Deimal comes like 'Decimal(P, S) string where P is precision and S is scale'
-    if db_type.startswith('Decimal'):
-        nums = [int(n) for n in db_type[8:-1].split(',')]
-        return orm_fields.DecimalField(nums[0], nums[1])
-    
-    # Simple fields
-    name = db_type + 'Field'
-    if not hasattr(orm_fields, name):
-        raise NotImplementedError('No field class for %s' % db_type)
-    return getattr(orm_fields, name)()
-ModelBase.create_ad_hoc_field = create_ad_hoc_field
-
-from six import PY3, string_types
-def _send(self, data, settings=None, stream=False):
-    if PY3 and isinstance(data, string_types):
-        data = data.encode('utf-8')
-    params = self._build_params(settings)
-    r = self.request_session.post(self.db_url, params=params, data=data, stream=stream, timeout=self.timeout)
-    if r.status_code != 200:
-        raise Exception(r.text)
-    return r
-Database._send = _send
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+# ClickHouse rejects concurrent queries within a session, so requests are serialized per session
+# id, across all the connections that share it
+_session_locks = weakref.WeakValueDictionary()
+_session_locks_mutex = threading.Lock()
+
+def _session_lock(session_id):
+    with _session_locks_mutex:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = threading.RLock()
+        return lock
+
+def _get_database_class():
+    global _database_class
+    if _database_class is not None:
+        return _database_class
+
+    import infi.clickhouse_orm.fields as orm_fields
+    from infi.clickhouse_orm.database import Database
+    from infi.clickhouse_orm.models import ModelBase
+    from infi.clickhouse_orm.utils import parse_tsv
+    from six import PY3, string_types
+
+    class _ModelBase(ModelBase):
+        # Keep ad hoc models apart from the ones created by the unpatched ORM
+        ad_hoc_model_cache = {}
+
+        @classmethod
+        def create_ad_hoc_field(cls, db_type):
+            # Enums
+            if db_type.startswith('Enum'):
+                db_type = 'String' # enum.Eum is not comparable
+            # Arrays
+            if db_type.startswith('Array'):
+                inner_field = cls.create_ad_hoc_field(db_type[6 : -1])
+                return orm_fields.ArrayField(inner_field)
+            # FixedString
+            if db_type.startswith('FixedString'):
+                db_type = 'String'
+
+            if db_type == 'LowCardinality(String)':
+                db_type = 'String'
+
+            if db_type.startswith('DateTime'):
+                db_type = 'DateTime'
+
+            if db_type.startswith('Nullable'):
+                inner_field = cls.create_ad_hoc_field(db_type[9 : -1])
+                return orm_fields.NullableField(inner_field)
+
+            # db_type for Deimal comes like 'Decimal(P, S) string where P is precision and S is scale'
+            if db_type.startswith('Decimal'):
+                nums = [int(n) for n in db_type[8:-1].split(',')]
+                return orm_fields.DecimalField(nums[0], nums[1])
+
+            # Simple fields
+            name = db_type + 'Field'
+            if not hasattr(orm_fields, name):
+                raise NotImplementedError('No field class for %s' % db_type)
+            return getattr(orm_fields, name)()
+
+    class _Database(Database):
+        # Held while a request is sent and its response consumed, see _session_lock
+        _lock = _NoLock()
+
+        def select(self, query, model_class=None, settings=None):
+            query += ' FORMAT TabSeparatedWithNamesAndTypes'
+            query = self._substitute(query, model_class)
+            with self._lock:
+                r = self._send(query, settings, True)
+                lines = r.iter_lines()
+                if not isinstance(self._lock, _NoLock):
+                    # Read the response in full while the session is locked and yield the rows
+                    # after releasing it, so that a partly consumed result doesn't block the session
+                    lines = iter(list(lines))
+            field_names = parse_tsv(next(lines))
+            field_types = parse_tsv(next(lines))
+            model_class = model_class or _ModelBase.create_ad_hoc_model(zip(field_names, field_types))
+            for line in lines:
+                # skip blank line left by WITH TOTALS modifier
+                if line:
+                    yield model_class.from_tsv(line, field_names, self.server_timezone, self)
+
+        def raw(self, query, settings=None, stream=False):
+            with self._lock:
+                return super(_Database, self).raw(query, settings=settings, stream=stream)
+
+        def _send(self, data, settings=None, stream=False):
+            if PY3 and isinstance(data, string_types):
+                data = data.encode('utf-8')
+            params = self._build_params(settings)
+            with self._lock:
+                r = self.request_session.post(self.db_url, params=params, data=data, stream=stream, timeout=self.timeout)
+            if r.status_code != 200:
+                raise Exception(r.text)
+            return r
+
+    _database_class = _Database
+    return _database_class
+
+def _columnar():
+    # Requires NumPy, so only imported by the bulk insert methods
+    try:
+        import sqlalchemy_clickhouse.columnar as columnar
+    except ImportError:
+        import columnar
+    return columnar
 
 #
 # Connector interface
@@ -121,26 +219,75 @@ Database._send = _send
 def connect(*args, **kwargs):
     return Connection(*args, **kwargs)
 
-class Connection(Database):
+class Connection(object):
     """
         These objects are small stateless factories for cursors, which do all the real work.
+
+        With ``session="True"`` (or an explicit ``session_id``) all requests are bound to a
+        ClickHouse HTTP session, so temporary tables and settings outlive a single query. The
+        session expires after ``session_timeout`` seconds of inactivity. ClickHouse rejects
+        concurrent queries within a session, so requests are then serialized across all the
+        connections bound to the same session, and ``select`` reads its whole result before
+        returning the first row.
     """
-    def __init__(self, db_name, db_url='http://localhost:8123/', username=None, password=None, readonly=False, ssl="False"):
+    def __init__(self, db_name, db_url='http://localhost:8123/', username=None, password=None, readonly=False, ssl="False",
+                 session="False", session_id=None, session_timeout=None):
         if ssl.upper() == "TRUE":
             db_url = db_url.replace("http", "https")
         elif ssl.upper() == "FALSE":
             pass
         else:
             raise ValueError("Not Supported value of ssl parameter, only True/False values are accepted")
-        super(Connection, self).__init__(db_name, db_url, username, password, readonly)
+        if str(session).upper() == "TRUE":
+            session_id = session_id or uuid.uuid4().hex
+        elif str(session).upper() != "FALSE":
+            raise ValueError("Not Supported value of session parameter, only True/False values are accepted")
+        self._writers = []
+        self._database = _get_database_class()(db_name, db_url, username, password, readonly)
+        if session_id:
+            self._database.add_setting('session_id', session_id)
+            self._database.add_setting('session_timeout', session_timeout)
+            self._database._lock = _session_lock(session_id)
+        self.session_id = session_id
+        self.session_timeout = session_timeout
         self.db_name = db_name
         self.db_url = db_url
         self.username = username
         self.password = password
         self.readonly = readonly
 
+    def __getattr__(self, name):
+        # Expose the rest of the ORM database interface (insert, create_table, ...)
+        if name == '_database':
+            raise AttributeError(name)
+        return getattr(self._database, name)
+
+    def select(self, query, model_class=None, settings=None):
+        return self._database.select(query, model_class=model_class, settings=settings)
+
+    def raw(self, query, settings=None, stream=False):
+        return self._database.raw(query, settings=settings, stream=stream)
+
+    @contextlib.contextmanager
+    def _request(self, data, settings=None):
+        """Send a request and yield its streamed response, which is closed on exit."""
+        with self._database._lock:
+            r = self._database._send(data, settings=settings, stream=True)
+            try:
+                yield r
+            finally:
+                r.close()
+
+    def buffered_writer(self, **kwargs):
+        """Return a :py:class:`BufferedWriter` batching inserts sent through this connection.
+        It is closed (and flushed) together with the connection."""
+        writer = BufferedWriter(self, **kwargs)
+        self._writers.append(writer)
+        return writer
+
     def close(self):
-        pass
+        writers, self._writers = self._writers, []
+        _close_writers(writers)
 
     def commit(self):
         pass
@@ -151,6 +298,244 @@ class Connection(Database):
     def rollback(self):
         raise NotSupportedError("Transactions are not supported")  # pragma: no cover
 
+# Writers still open at interpreter exit, flushed by _close_writers
+_open_writers = weakref.WeakSet()
+
+def _close_writers(writers=None):
+    """Close all the writers, even if some fail to flush, then raise the first error."""
+    error = None
+    for writer in list(_open_writers if writers is None else writers):
+        try:
+            writer.close()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+atexit.register(_close_writers)
+
+class _Batch(object):
+    __slots__ = ('table', 'columns', 'values', 'nbytes', 'created')
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+        self.values = []
+        self.nbytes = 0
+        self.created = time.time()
+
+class BufferedWriter(object):
+    """Accumulates small inserts in memory, per table, and writes them in batches from a
+    background thread.
+
+    A batch is written once it holds ``max_rows`` rows or ``max_bytes`` bytes of encoded values,
+    or ``flush_interval`` seconds after its first row was buffered. Once ``buffer_rows`` rows are
+    pending, :py:meth:`insert` blocks until a flush frees up space, and raises :py:class:`Error`
+    if that takes longer than ``timeout`` seconds.
+
+    ``on_flush(table, rows, latency)`` and ``on_error(table, values, exc)`` are called from the
+    flushing thread after each write. Failed batches are not retried, ``on_error`` receives the
+    encoded values so they can be resubmitted.
+
+    With ``async_insert=True`` rows are not buffered on the client, every :py:meth:`insert` is
+    sent right away and batched by the server instead. This requires ClickHouse 21.11, older
+    servers fall back to client side buffering.
+    """
+    def __init__(self, connection, max_rows=10000, max_bytes=1 << 20, flush_interval=1.0,
+                 buffer_rows=100000, timeout=None, async_insert=False, on_flush=None, on_error=None):
+        self._connection = connection
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.buffer_rows = buffer_rows
+        self.timeout = timeout
+        self.async_insert = async_insert and tuple(connection.server_version) >= (21, 11)
+        self.on_flush = on_flush
+        self.on_error = on_error
+        # Statistics
+        self.flushes = 0
+        self.failures = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.flush_time = 0.0
+        self.last_flush_latency = None
+        self.last_error = None
+        # Internal helper state
+        self._cond = threading.Condition()
+        self._batches = {}
+        self._pending = 0
+        self._waiting = 0
+        self._closed = False
+        self._thread = None
+        if not self.async_insert:
+            self._thread = threading.Thread(target=self._run, name='clickhouse-buffered-writer')
+            self._thread.daemon = True
+            self._thread.start()
+        _open_writers.add(self)
+
+    @property
+    def stats(self):
+        """Counters describing the writes done so far."""
+        with self._cond:
+            return {
+                'flushes': self.flushes,
+                'failures': self.failures,
+                'rows_written': self.rows_written,
+                'bytes_written': self.bytes_written,
+                'rows_pending': self._pending,
+                'flush_time': self.flush_time,
+                'last_flush_latency': self.last_flush_latency,
+            }
+
+    def insert(self, table, rows, columns=None):
+        """Queue ``rows`` (sequences or mappings) for insertion into ``table``, which may be a
+        table name or a SQLAlchemy ``Table``. Without ``columns``, mappings are inserted into the
+        columns named by the keys of the first row."""
+        table = getattr(table, 'fullname', table)
+        rows = list(rows)
+        if not columns and rows and isinstance(rows[0], dict):
+            columns = list(rows[0])
+        columns = tuple(columns) if columns else None
+        values = [self._encode(row, columns) for row in rows]
+        if not values:
+            return
+        if self.async_insert:
+            if self._closed:
+                raise Error("Writer is closed")
+            batch = _Batch(table, columns)
+            batch.values = values
+            batch.nbytes = sum(len(v) for v in values)
+            with self._cond:
+                self._pending += len(values)
+            self._write(batch, raise_errors=True)
+            return
+        with self._cond:
+            deadline = None if self.timeout is None else time.time() + self.timeout
+            while not self._closed and self._pending and self._pending + len(values) > self.buffer_rows:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise Error("Insert buffer is full")
+                # Make the flusher write out the oldest batches right away
+                self._waiting += 1
+                self._cond.notify_all()
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            if self._closed:
+                raise Error("Writer is closed")
+            batch = self._batches.get((table, columns))
+            if batch is None:
+                batch = self._batches[(table, columns)] = _Batch(table, columns)
+            batch.values.extend(values)
+            batch.nbytes += sum(len(v) for v in values)
+            self._pending += len(values)
+            if len(batch.values) >= self.max_rows or batch.nbytes >= self.max_bytes:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Write all buffered rows now, raising the first error encountered."""
+        with self._cond:
+            batches, self._batches = list(self._batches.values()), {}
+        error = None
+        for batch in batches:
+            try:
+                self._write(batch, raise_errors=True)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Stop the flushing thread and write out what is left in the buffer."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        _open_writers.discard(self)
+        writers = getattr(self._connection, '_writers', [])
+        if self in writers:
+            writers.remove(self)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _encode(self, row, columns):
+        if isinstance(row, dict):
+            if columns is None:
+                raise Error("Mapping rows need column names")
+            row = [row[c] for c in columns]
+        return '({})'.format(','.join('{}'.format(v) for v in _escaper.escape_args(tuple(row))))
+
+    def _take_due(self, now):
+        for key, batch in self._batches.items():
+            if (len(batch.values) >= self.max_rows or batch.nbytes >= self.max_bytes or
+                    now - batch.created >= self.flush_interval):
+                return self._batches.pop(key)
+        if self._waiting and self._batches:
+            # The buffer is full, free up space starting with the oldest batch
+            key = min(self._batches, key=lambda k: self._batches[k].created)
+            return self._batches.pop(key)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    now = time.time()
+                    batch = self._take_due(now)
+                    if batch is not None:
+                        break
+                    wait = self.flush_interval
+                    for b in self._batches.values():
+                        wait = min(wait, b.created + self.flush_interval - now)
+                    self._cond.wait(max(wait, 0.001))
+            try:
+                self._write(batch)
+            except Exception:
+                pass  # Reported through on_error and the statistics
+
+    def _write(self, batch, raise_errors=False):
+        query = 'INSERT INTO {}{} VALUES {}'.format(
+            batch.table, ' ({})'.format(', '.join(batch.columns)) if batch.columns else '',
+            ','.join(batch.values))
+        settings = {'async_insert': 1, 'wait_for_async_insert': 1} if self.async_insert else None
+        rows = len(batch.values)
+        start = time.time()
+        try:
+            self._connection.raw(query, settings=settings)
+        except Exception as e:
+            with self._cond:
+                self.failures += 1
+                self.last_error = e
+                self._pending -= rows
+                self._cond.notify_all()
+            if self.on_error is not None:
+                self.on_error(batch.table, batch.values, e)
+            if raise_errors:
+                raise
+            return
+        latency = time.time() - start
+        with self._cond:
+            self.flushes += 1
+            self.rows_written += rows
+            self.bytes_written += batch.nbytes
+            self.flush_time += latency
+            self.last_flush_latency = latency
+            self._pending -= rows
+            self._cond.notify_all()
+        if self.on_flush is not None:
+            self.on_flush(batch.table, rows, latency)
+
 class Cursor(object):
     """These objects represent a database cursor, which is used to manage the context of a fetch
     operation.
@@ -227,6 +612,7 @@ class Cursor(object):
             self._process_response(response)
         else:
             self._db.raw(sql)
+            self._state = self._STATE_FINISHED
 
     def executemany(self, operation, seq_of_parameters):
         """Prepare a database operation (query or command) and then execute it against all parameter
@@ -255,6 +641,133 @@ class Cursor(object):
         for parameters in seq_of_parameters[:-1]:
             self.execute(operation, parameters, is_response=False)
 
+    def execute_to_stream(self, operation, fmt, fileobj, parameters=None, chunk_size=1 << 20,
+                          wait_end_of_query=False):
+        """Execute a query and write its result, in the ClickHouse output format ``fmt``, to
+        ``fileobj`` (anything with a ``write`` method, e.g. a file, pipe or mmap) without decoding
+        any rows.
+
+        The response body is copied in chunks of ``chunk_size`` bytes. Returns a dict with the
+        number of ``bytes`` written and of ``rows``, which is counted from line breaks for one row
+        per line formats (TSV, JSONEachRow, ...) and ``None`` for other formats.
+
+        When a query fails after the server started sending its result, ClickHouse appends the
+        exception (``Code: NNN. DB::Exception: ...``) to the response. Such a trailer is detected
+        at the end of the stream and raised as :py:class:`Error`, after it was written to
+        ``fileobj`` along with the partial result. With ``wait_end_of_query=True`` the server
+        buffers the whole result first, so that errors are raised before anything is written.
+        """
+        if parameters is None or not parameters:
+            sql = operation
+        else:
+            sql = operation % _escaper.escape_args(parameters)
+
+        self._reset_state()
+
+        self._state = self._STATE_RUNNING
+        self._uuid = uuid.uuid1()
+
+        header_lines = _LINE_FORMATS.get(fmt)
+        nbytes = lines = 0
+        tail = b''
+        query = self._db._substitute('{} FORMAT {}'.format(sql, fmt), None)
+        settings = {'query_id': self._uuid}
+        if wait_end_of_query:
+            settings['wait_end_of_query'] = 1
+        with self._db._request(query, settings=settings) as r:
+            for chunk in r.iter_content(chunk_size):
+                fileobj.write(chunk)
+                nbytes += len(chunk)
+                if header_lines is not None:
+                    lines += chunk.count(b'\n')
+                tail = chunk[-_STREAM_TAIL:] if len(chunk) >= _STREAM_TAIL else (tail + chunk)[-_STREAM_TAIL:]
+        self._state = self._STATE_FINISHED
+
+        errors = _RE_STREAM_EXCEPTION.findall(tail)
+        if errors:
+            raise Error(errors[-1].decode('utf-8', 'replace'))
+
+        rows = None
+        if header_lines is not None:
+            rows = max(lines - header_lines, 0)
+        return {'bytes': nbytes, 'rows': rows}
+
+    def insert_columns(self, table, columns, types=None, fmt='Native', chunk_size=65536):
+        """Insert column data into ``table`` without rendering it as SQL text, and return the
+        number of rows inserted.
+
+        ``columns`` maps column names to NumPy arrays (or other sequences) of equal length, or is
+        a ``pyarrow.Table``. The data is encoded in the ``Native`` or ``Arrow`` input format and
+        streamed to the server in blocks of ``chunk_size`` rows. ``Native`` encodes each column
+        to its type in the table, read with ``DESCRIBE TABLE`` unless given as ``types``; naive
+        datetimes are taken as UTC. Unsupported types raise ``NotImplementedError`` and values
+        that don't fit their column raise ``ValueError``, both before anything is sent. This
+        covers integers outside of their type's range, NaN or None in columns that are not
+        Nullable, and dates outside of the range of their type (1900 to 2299 for DateTime64).
+        """
+        self._check_insert_format(fmt)
+        columnar = _columnar()
+        if hasattr(columns, 'to_batches'):
+            names = columns.column_names
+            if fmt == 'Arrow':
+                return self._insert_stream(table, names, 'ArrowStream',
+                    columnar.arrow_stream(columns.to_batches(max_chunksize=chunk_size)), columns.num_rows)
+            data = columnar.native_blocks(names, self._column_types(table, names, types),
+                lambda: columnar.arrow_chunks(columns, chunk_size))
+            return self._insert_stream(table, names, fmt, data, columns.num_rows)
+        columns = list(columns.items()) if hasattr(columns, 'items') else list(columns)
+        names = [name for name, _ in columns]
+        arrays = [columnar.np.asarray(values) for _, values in columns]
+        rows = len(arrays[0]) if arrays else 0
+        if any(len(a) != rows for a in arrays):
+            raise ValueError("All columns must have the same length")
+        if fmt == 'Arrow':
+            data = columnar.arrow_stream(columnar.arrow_batches(names, arrays, chunk_size))
+            return self._insert_stream(table, names, 'ArrowStream', data, rows)
+        data = columnar.native_blocks(names, self._column_types(table, names, types),
+            lambda: columnar.array_chunks(arrays, chunk_size))
+        return self._insert_stream(table, names, fmt, data, rows)
+
+    def insert_dataframe(self, table, frame, types=None, fmt='Native', chunk_size=65536):
+        """Insert a pandas DataFrame into ``table``, see :py:meth:`insert_columns`. Frame chunks
+        are converted one at a time, missing values are inserted as NULL."""
+        self._check_insert_format(fmt)
+        columnar = _columnar()
+        names = list(frame.columns)
+        if fmt == 'Arrow':
+            data = columnar.arrow_stream(columnar.arrow_frame_batches(frame, chunk_size))
+            return self._insert_stream(table, names, 'ArrowStream', data, len(frame))
+        data = columnar.native_blocks(names, self._column_types(table, names, types),
+            lambda: columnar.frame_chunks(frame, chunk_size))
+        return self._insert_stream(table, names, fmt, data, len(frame))
+
+    def _check_insert_format(self, fmt):
+        if fmt != 'Native' and fmt != 'Arrow':
+            raise NotImplementedError("Unsupported insert format {}".format(fmt))
+
+    def _column_types(self, table, names, types):
+        if types is None:
+            table = getattr(table, 'fullname', table)
+            types = dict((r.name, r.type) for r in self._db.select('DESCRIBE TABLE {}'.format(table)))
+        missing = [name for name in names if name not in types]
+        if missing:
+            raise Error("Unknown columns {}".format(', '.join(missing)))
+        return [types[name] for name in names]
+
+    def _insert_stream(self, table, names, fmt, data, rows):
+        table = getattr(table, 'fullname', table)
+        query = 'INSERT INTO {} ({}) FORMAT {}'.format(table, ', '.join(names), fmt)
+
+        self._reset_state()
+
+        self._state = self._STATE_RUNNING
+        self._uuid = uuid.uuid1()
+
+        with self._db._request(data, settings={'query': query, 'query_id': self._uuid}):
+            pass
+        self._state = self._STATE_FINISHED
+        return rows
+
     def fetchone(self):
         """Fetch the next row of a query result set, returning a single sequence, or ``None`` when
         no more data is available. """
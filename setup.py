@@ -22,6 +22,11 @@ setup(
         'sqlalchemy>=1.0.0',
         'infi.clickhouse_orm>=1.2.0'
     ],
+    extras_require = {
+        'numpy': ['numpy'],
+        'pandas': ['numpy', 'pandas'],
+        'arrow': ['numpy', 'pyarrow'],
+    },
     packages=[
         'sqlalchemy_clickhouse',
     ],
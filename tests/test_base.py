@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+sa = pytest.importorskip('sqlalchemy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import base
+
+t = sa.Table('t', sa.MetaData(),
+             sa.Column('a', sa.String),
+             sa.Column('b', sa.Integer),
+             sa.Column('arr', sa.ARRAY(sa.Integer)),
+             sa.Column('select', sa.Integer))
+
+
+def compile(element, literal_binds=False):
+    kw = {'compile_kwargs': {'literal_binds': True}} if literal_binds else {}
+    return str(element.compile(dialect=base.dialect(), **kw))
+
+
+# SQL produced by the dialect when it was based on the PostgreSQL compiler
+
+def test_distinct_on():
+    assert compile(sa.select([t.c.a]).distinct(t.c.a)) == 'SELECT DISTINCT ON (a) a \nFROM t'
+    assert compile(sa.select([t.c.a]).distinct(t.c.a, t.c.b)) == 'SELECT DISTINCT ON (a, b) a \nFROM t'
+    assert compile(sa.select([t.c.a]).distinct()) == 'SELECT DISTINCT a \nFROM t'
+    assert compile(sa.select([t.c.a])) == 'SELECT a \nFROM t'
+
+def test_array_index():
+    assert compile(sa.select([t.c.arr[1]])) == 'SELECT arr[%(arr_1)s] AS anon_1 \nFROM t'
+    assert compile(sa.select([t.c.arr[1]]), literal_binds=True) == 'SELECT arr[1] AS anon_1 \nFROM t'
+
+def test_ilike():
+    assert compile(sa.select([t.c.a]).where(t.c.a.ilike('x%'))) == 'SELECT a \nFROM t \nWHERE a ILIKE %(a_1)s'
+    assert compile(sa.select([t.c.a]).where(~t.c.a.ilike('x%'))) == 'SELECT a \nFROM t \nWHERE a NOT ILIKE %(a_1)s'
+    assert compile(sa.select([t.c.a]).where(t.c.a.notilike('x%')), literal_binds=True) == \
+        "SELECT a \nFROM t \nWHERE a NOT ILIKE 'x%%'"
+
+def test_literal_backslashes_are_escaped():
+    assert compile(sa.select([t.c.a]).where(t.c.a == 'x\\y'), literal_binds=True) == \
+        "SELECT a \nFROM t \nWHERE a = 'x\\\\y'"
+
+def test_functions():
+    assert compile(sa.select([sa.func.count()]).select_from(t)) == 'SELECT count(*) AS count_1 \nFROM t'
+    assert compile(sa.select([sa.func.random(), sa.func.now(), sa.func.current_date()])) == \
+        'SELECT rand() AS random_1, now() AS now_1, today() AS current_date_1'
+    assert compile(sa.select([sa.func.substring(t.c.a, 1, 2)]), literal_binds=True) == \
+        'SELECT substring(a, 1, 2) AS substring_1 \nFROM t'
+    assert compile(sa.select([t.c.a + 'x'])) == 'SELECT concat(a, %(a_1)s) AS anon_1 \nFROM t'
+
+def test_in():
+    assert compile(sa.select([t.c.a]).where(t.c.b.in_([1, 2]))) == 'SELECT a \nFROM t \nWHERE b IN (1, 2)'
+    # Parenthesized by SQLAlchemy 1.4
+    assert 'b NOT IN (1, 2)' in compile(sa.select([t.c.a]).where(~t.c.b.in_([1, 2])), literal_binds=True)
+
+def test_misc():
+    assert compile(sa.select([t.c.a]).where(sa.true())) == 'SELECT a \nFROM t \nWHERE 1'
+    assert compile(sa.select([t.c.select])) == 'SELECT "select" \nFROM t'
+    assert compile(sa.select([t.c.a]).limit(10), literal_binds=True) == 'SELECT a \nFROM t\n LIMIT 10'
+    assert compile(sa.select([t.c.b % 2]), literal_binds=True) == 'SELECT b %% 2 AS anon_1 \nFROM t'
+    assert compile(sa.select([t.c.a]).where(t.c.a.like('%x')), literal_binds=True) == \
+        "SELECT a \nFROM t \nWHERE a LIKE '%%x'"
@@ -0,0 +1,225 @@
+import os
+import struct
+import sys
+from datetime import date, datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import columnar
+import connector
+
+
+def string(s):
+    s = s.encode('utf-8')
+    return columnar._varint(len(s)) + s
+
+def block(rows, *columns):
+    """ Expected Native block for (name, type, encoded data) columns. """
+    out = columnar._varint(len(columns)) + columnar._varint(rows)
+    for name, db_type, data in columns:
+        out += string(name) + string(db_type) + data
+    return out
+
+def encode(names, types, arrays, chunk_size=65536):
+    arrays = [np.asarray(a) for a in arrays]
+    return list(columnar.native_blocks(names, types, lambda: columnar.array_chunks(arrays, chunk_size)))
+
+
+def test_varint():
+    assert columnar._varint(0) == b'\x00'
+    assert columnar._varint(127) == b'\x7f'
+    assert columnar._varint(128) == b'\x80\x01'
+    assert columnar._varint(300) == b'\xac\x02'
+
+def test_numeric():
+    assert encode(['a', 'b', 'c'], ['Int32', 'UInt64', 'Float32'], [[1, -2], np.array([3, 2 ** 64 - 1], dtype='u8'), [0.5, 1.5]]) == [
+        block(2,
+              ('a', 'Int32', struct.pack('<2i', 1, -2)),
+              ('b', 'UInt64', struct.pack('<2Q', 3, 2 ** 64 - 1)),
+              ('c', 'Float32', struct.pack('<2f', 0.5, 1.5)))]
+
+def test_nullable():
+    assert encode(['a', 's'], ['Nullable(Int64)', 'Nullable(String)'], [[1.0, np.nan], [None, 'x']]) == [
+        block(2,
+              ('a', 'Nullable(Int64)', b'\x00\x01' + struct.pack('<2q', 1, 0)),
+              ('s', 'Nullable(String)', b'\x01\x00' + b'\x00' + b'\x01x'))]
+
+def test_low_cardinality_is_sent_as_plain_values():
+    assert encode(['s'], ['LowCardinality(Nullable(String))'], [['ab', None]]) == [
+        block(2, ('s', 'Nullable(String)', b'\x00\x01' + b'\x02ab' + b'\x00'))]
+
+def test_dates():
+    values = [datetime(1970, 1, 2), datetime(2020, 1, 1, 0, 0, 1)]
+    assert encode(['d', 'd32', 'dt'], ['Date', 'Date32', "DateTime('UTC')"], [values, [date(1960, 1, 1), date(1970, 1, 2)], values]) == [
+        block(2,
+              ('d', 'Date', struct.pack('<2H', 1, 18262)),
+              ('d32', 'Date32', struct.pack('<2i', -3653, 1)),
+              ('dt', "DateTime('UTC')", struct.pack('<2I', 86400, 1577836801)))]
+
+@pytest.mark.parametrize('precision,ticks', [(0, 1), (3, 1234), (6, 1234567), (9, 1234567000)])
+def test_datetime64_precision(precision, ticks):
+    db_type = 'DateTime64(%d)' % precision
+    values = np.array(['1970-01-01T00:00:01.234567'], dtype='datetime64[us]')
+    assert encode(['t'], [db_type], [values]) == [block(1, ('t', db_type, struct.pack('<q', ticks)))]
+
+def test_dates_out_of_range():
+    with pytest.raises(ValueError):
+        encode(['d'], ['Date'], [[date(1960, 1, 1)]])
+    with pytest.raises(ValueError):
+        encode(['d'], ['Date'], [[date(2150, 1, 1)]])
+    with pytest.raises(ValueError):
+        encode(['d'], ['DateTime'], [np.array(['NaT'], dtype='datetime64[s]')])
+
+@pytest.mark.parametrize('db_type,values', [
+    ('Int8', [1, 300]),
+    ('Int8', [-129]),
+    ('UInt8', [-1]),
+    ('UInt32', np.array([2 ** 32], dtype='i8')),
+    ('Int64', [2 ** 63]),
+    ('UInt64', [1.0, -1.0]),
+])
+def test_integers_out_of_range(db_type, values):
+    with pytest.raises(ValueError):
+        encode(['a'], [db_type], [values])
+
+def test_integer_limits():
+    assert encode(['a', 'b'], ['Int8', 'UInt8'], [[-128, 127], [0, 255]]) == [
+        block(2, ('a', 'Int8', struct.pack('<2b', -128, 127)), ('b', 'UInt8', struct.pack('<2B', 0, 255)))]
+    assert encode(['a'], ['Int64'], [np.array([1, 2 ** 62], dtype=object)]) == [
+        block(2, ('a', 'Int64', struct.pack('<2q', 1, 2 ** 62)))]
+
+@pytest.mark.parametrize('db_type,values', [
+    ('Int64', [1.0, np.nan]),
+    ('Int32', [1, None]),
+    ('Float64', [1.5, None]),
+])
+def test_nulls_in_non_nullable_numbers(db_type, values):
+    with pytest.raises(ValueError):
+        encode(['a'], [db_type], [values])
+
+def test_null_checks_happen_before_encoding():
+    arrays = [np.array([1, None], dtype=object)]
+    with pytest.raises(ValueError):
+        columnar.native_blocks(['a'], ['Int32'], lambda: columnar.array_chunks(arrays, 1))
+
+def test_datetime64_range():
+    values = np.array(['1900-01-01T00:00:00', '2299-12-31T23:59:59.999'], dtype='datetime64[ms]')
+    assert encode(['t'], ['DateTime64(3)'], [values]) == [
+        block(2, ('t', 'DateTime64(3)', struct.pack('<2q', -2208988800000, 10413791999999)))]
+    # Used to wrap around when converted through nanoseconds
+    assert encode(['t'], ['DateTime64(3)'], [[datetime(2290, 1, 1)]]) == [
+        block(1, ('t', 'DateTime64(3)', struct.pack('<q', 10098259200000)))]
+    for value in ['1899-12-31T23:59:59', '2300-01-01T00:00:00', 'NaT']:
+        with pytest.raises(ValueError):
+            encode(['t'], ['DateTime64(3)'], [np.array([value, '2000-01-01'], dtype='datetime64[s]')])
+    # Nanosecond ticks stop in 2262
+    with pytest.raises(ValueError):
+        encode(['t'], ['DateTime64(9)'], [[datetime(2263, 1, 1)]])
+    assert encode(['t'], ['DateTime64(9)'], [[datetime(2262, 1, 1)]]) == [
+        block(1, ('t', 'DateTime64(9)', struct.pack('<q', 9214646400 * 10 ** 9)))]
+
+def test_fixed_string():
+    assert encode(['s'], ['FixedString(3)'], [['ab', 'abc']]) == [block(2, ('s', 'FixedString(3)', b'ab\x00abc'))]
+    with pytest.raises(ValueError):
+        encode(['s'], ['FixedString(3)'], [['abcdef']])
+
+def test_enum():
+    db_type = "Enum8('a' = 1, 'b\\'c' = -2)"
+    assert encode(['e'], [db_type], [['a', "b'c"]]) == [block(2, ('e', db_type, struct.pack('<2b', 1, -2)))]
+    assert encode(['e'], [db_type], [[1, -2]]) == [block(2, ('e', db_type, struct.pack('<2b', 1, -2)))]
+    with pytest.raises(ValueError):
+        encode(['e'], [db_type], [['a', 'x']])
+    with pytest.raises(ValueError):
+        encode(['e'], [db_type], [[1, 2]])
+
+def test_nullable_enum_uses_first_value_for_null():
+    db_type = "Nullable(Enum16('a' = 5, 'b' = 3))"
+    assert encode(['e'], [db_type], [['a', None]]) == [block(2, ('e', db_type, b'\x00\x01' + struct.pack('<2h', 5, 3)))]
+
+def test_chunk_boundaries():
+    blocks = encode(['a'], ['UInt8'], [[1, 2, 3, 4, 5]], chunk_size=2)
+    assert blocks == [block(2, ('a', 'UInt8', b'\x01\x02')),
+                      block(2, ('a', 'UInt8', b'\x03\x04')),
+                      block(1, ('a', 'UInt8', b'\x05'))]
+
+def test_invalid_values_are_rejected_before_encoding():
+    arrays = [np.array([date(1970, 1, 2), date(1960, 1, 1)])]
+    with pytest.raises(ValueError):
+        # The bad value is in the second chunk, the first one must not be produced
+        columnar.native_blocks(['d'], ['Date'], lambda: columnar.array_chunks(arrays, 1))
+    with pytest.raises(NotImplementedError):
+        columnar.native_blocks(['d'], ['Decimal(10, 2)'], lambda: columnar.array_chunks(arrays, 1))
+
+def test_frame_chunks():
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame({
+        't': pd.to_datetime(['2020-01-01 01:00:00', '2020-01-01 02:00:00', '2020-01-01 03:00:00']).tz_localize('Europe/Prague'),
+        'n': pd.array([1, None, 3], dtype='Int64'),
+    })
+    blocks = list(columnar.native_blocks(['t', 'n'], ['DateTime', 'Nullable(Int8)'],
+                                         lambda: columnar.frame_chunks(frame, 2)))
+    assert blocks == [
+        block(2,
+              ('t', 'DateTime', struct.pack('<2I', 1577836800, 1577840400)),
+              ('n', 'Nullable(Int8)', b'\x00\x01' + struct.pack('<2b', 1, 0))),
+        block(1,
+              ('t', 'DateTime', struct.pack('<I', 1577844000)),
+              ('n', 'Nullable(Int8)', b'\x00' + struct.pack('<b', 3)))]
+
+def test_arrow_chunks():
+    pa = pytest.importorskip('pyarrow')
+    table = pa.table({'a': [1, 2, 3], 's': ['x', None, 'z']})
+    blocks = list(columnar.native_blocks(['a', 's'], ['UInt16', 'Nullable(String)'],
+                                         lambda: columnar.arrow_chunks(table, 2)))
+    assert blocks == [
+        block(2, ('a', 'UInt16', struct.pack('<2H', 1, 2)), ('s', 'Nullable(String)', b'\x00\x01\x01x\x00')),
+        block(1, ('a', 'UInt16', struct.pack('<H', 3)), ('s', 'Nullable(String)', b'\x00\x01z'))]
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.requests = []
+
+    def _request(self, data, settings=None):
+        self.requests.append(settings['query'])
+        return FakeRequest(data)
+
+class FakeRequest(object):
+    def __init__(self, data):
+        self.body = b''.join(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+def test_insert_columns():
+    db = FakeConnection()
+    cursor = connector.Cursor(db)
+    assert cursor.insert_columns('t', [('a', [1, 2])], types={'a': 'UInt8'}) == 2
+    assert db.requests == ['INSERT INTO t (a) FORMAT Native']
+
+def test_insert_columns_sends_nothing_on_invalid_data():
+    db = FakeConnection()
+    cursor = connector.Cursor(db)
+    with pytest.raises(ValueError):
+        cursor.insert_columns('t', {'d': [date(1970, 1, 1), date(1960, 1, 1)]}, types={'d': 'Date'}, chunk_size=1)
+    with pytest.raises(NotImplementedError):
+        cursor.insert_columns('t', {'u': ['x']}, types={'u': 'UUID'})
+    assert db.requests == []
+
+def test_insert_format_is_checked_first():
+    db = FakeConnection()
+    cursor = connector.Cursor(db)
+    # Without types, the column types would be read from the (fake) database first
+    with pytest.raises(NotImplementedError):
+        cursor.insert_columns('t', {'a': [1]}, fmt='CSV')
+    with pytest.raises(NotImplementedError):
+        cursor.insert_columns('t', {'a': [1]}, fmt='ArrowStream')
+    with pytest.raises(NotImplementedError):
+        cursor.insert_dataframe('t', None, fmt='CSV')
+    assert db.requests == []
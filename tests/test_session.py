@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import connector
+
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, lines=()):
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        pass
+
+class FakeDatabase(object):
+    """ Stands in for the ORM database, counting the requests that are sent at the same time. """
+    _lock = connector._NoLock()
+
+    def __init__(self, *args, **kwargs):
+        self.settings = {}
+        self.active = self.overlaps = 0
+
+    def add_setting(self, name, value):
+        self.settings[name] = value
+
+    def _send(self, data, settings=None, stream=False):
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        time.sleep(0.001)
+        self.active -= 1
+        return FakeResponse()
+
+@pytest.fixture(autouse=True)
+def fake_database(monkeypatch):
+    monkeypatch.setattr(connector, '_database_class', FakeDatabase)
+
+
+def test_session_settings():
+    connection = connector.Connection('default', session_id='s1', session_timeout=60)
+    assert connection.session_id == 's1'
+    assert connection._database.settings == {'session_id': 's1', 'session_timeout': 60}
+    generated = connector.Connection('default', session='True')
+    assert len(generated.session_id) == 32
+    assert connector.Connection('default').session_id is None
+    with pytest.raises(ValueError):
+        connector.Connection('default', session='maybe')
+
+def test_locks_are_shared_per_session():
+    a = connector.Connection('default', session_id='s1')
+    b = connector.Connection('default', session_id='s1')
+    c = connector.Connection('default', session_id='s2')
+    assert a._database._lock is b._database._lock
+    assert a._database._lock is not c._database._lock
+    assert isinstance(connector.Connection('default')._database._lock, connector._NoLock)
+
+def test_requests_are_serialized_per_session():
+    # Several connections to the same session, sharing their (fake) database to count overlaps
+    connections = [connector.Connection('default', session_id='s1') for _ in range(4)]
+    database = connections[0]._database
+    for connection in connections:
+        connection._database = database
+
+    def run(connection):
+        for _ in range(20):
+            with connection._request('SELECT 1'):
+                pass
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in connections]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert database.active == 0
+    assert database.overlaps == 0
+
+
+class FakeSession(object):
+    def __init__(self, lines):
+        self.lines = lines
+
+    def post(self, url, params=None, data=None, stream=False, timeout=None):
+        return FakeResponse(self.lines)
+
+def orm_database(monkeypatch, lines):
+    pytest.importorskip('infi.clickhouse_orm')
+    import pytz
+    monkeypatch.setattr(connector, '_database_class', None)
+    cls = connector._get_database_class()
+    # Skip the constructor, which queries the server
+    database = cls.__new__(cls)
+    database.db_name = 'default'
+    database.db_url = 'http://localhost:8123/'
+    database.db_exists = True
+    database.readonly = False
+    database.timeout = 60
+    database.settings = {}
+    database.log_statements = False
+    database.server_timezone = pytz.utc
+    database.request_session = FakeSession(lines)
+    return database
+
+def test_select_releases_the_session_before_yielding(monkeypatch):
+    database = orm_database(monkeypatch, [b'n', b'UInt8', b'1', b'2'])
+    database._lock = connector._session_lock('s1')
+    rows = database.select('SELECT n FROM t')
+    assert next(rows).n == 1
+    # Another thread can use the session while the result is consumed
+    acquired = []
+
+    def use_session():
+        if database._lock.acquire(timeout=1):
+            acquired.append(True)
+            database._lock.release()
+
+    thread = threading.Thread(target=use_session)
+    thread.start()
+    thread.join()
+    assert acquired == [True]
+    assert [row.n for row in rows] == [2]
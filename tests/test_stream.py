@@ -0,0 +1,88 @@
+import io
+import os
+import sys
+from string import Template
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import connector
+
+
+class FakeResponse(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+class FakeConnection(object):
+    """ Serves ``chunks`` as the streamed response of every request. """
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.requests = []
+
+    def _substitute(self, query, model_class=None):
+        return Template(query).safe_substitute(db='default')
+
+    def _request(self, data, settings=None):
+        self.requests.append((data, settings))
+        return FakeRequest(FakeResponse(self.chunks))
+
+class FakeRequest(object):
+    def __init__(self, response):
+        self.response = response
+
+    def __enter__(self):
+        return self.response
+
+    def __exit__(self, *args):
+        self.response.closed = True
+
+def stream(db, query, fmt, parameters=None, **kwargs):
+    out = io.BytesIO()
+    result = connector.Cursor(db).execute_to_stream(query, fmt, out, parameters, **kwargs)
+    return result, out.getvalue()
+
+
+def test_bytes_and_rows():
+    db = FakeConnection(b'1\ta\n2\tb', b'\n3\tc\n')
+    assert stream(db, 'SELECT * FROM t', 'TSV') == ({'bytes': 12, 'rows': 3}, b'1\ta\n2\tb\n3\tc\n')
+    assert db.requests[0][0] == 'SELECT * FROM t FORMAT TSV'
+
+def test_header_lines_are_not_rows():
+    data = b'n\ts\nUInt8\tString\n1\ta\n2\tb\n'
+    assert stream(FakeConnection(data), 'SELECT * FROM t', 'TSVWithNamesAndTypes')[0] == {'bytes': len(data), 'rows': 2}
+    db = FakeConnection(b'n\ts\n')
+    assert stream(db, 'SELECT * FROM t', 'TabSeparatedWithNames')[0] == {'bytes': 4, 'rows': 0}
+
+def test_rows_are_not_counted_for_other_formats():
+    db = FakeConnection(b'PAR1\n\n\x00', b'PAR1')
+    assert stream(db, 'SELECT * FROM t', 'Parquet') == ({'bytes': 11, 'rows': None}, b'PAR1\n\n\x00PAR1')
+
+def test_parameters_are_substituted():
+    db = FakeConnection(b'')
+    stream(db, 'SELECT * FROM $db.t WHERE s = %(s)s', 'TSV', {'s': "a$b'c"})
+    data, settings = db.requests[0]
+    assert data == "SELECT * FROM default.t WHERE s = 'a$b\\'c' FORMAT TSV"
+    assert 'wait_end_of_query' not in settings
+
+def test_wait_end_of_query():
+    db = FakeConnection(b'')
+    stream(db, 'SELECT 1', 'TSV', wait_end_of_query=True)
+    assert db.requests[0][1]['wait_end_of_query'] == 1
+
+def test_exception_trailer_raises():
+    error = b'Code: 395. DB::Exception: Value passed to \'throwIf\' function is non-zero. (FUNCTION_THROW_IF_VALUE_IS_NON_ZERO)'
+    db = FakeConnection(b'1\n2\n' * 10000, b'3\n' + error[:20], error[20:] + b'\n')
+    out = io.BytesIO()
+    with pytest.raises(connector.Error) as e:
+        connector.Cursor(db).execute_to_stream('SELECT throwIf(number = 3) FROM numbers(10)', 'TSV', out)
+    assert str(e.value) == error.decode('utf-8')
+    # The partial result has been written already
+    assert out.getvalue().endswith(b'3\n' + error + b'\n')
+
+def test_exception_text_in_data_is_not_an_error():
+    data = b'1\tCode: 60. DB::Exception: Table default.t does not exist\n'
+    assert stream(FakeConnection(data), 'SELECT * FROM errors', 'TSV')[0] == {'bytes': len(data), 'rows': 1}
@@ -0,0 +1,180 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import connector
+
+
+class FakeDatabase(object):
+    """ Stands in for the ORM database, recording the queries sent through ``raw``. """
+    _lock = connector._NoLock()
+
+    def __init__(self, *args, **kwargs):
+        self.server_version = (21, 8)
+        self.queries = []
+        self.settings = []
+        self.written = threading.Event()
+        self.block = None
+        self.fail = None
+
+    def add_setting(self, name, value):
+        pass
+
+    def raw(self, query, settings=None, stream=False):
+        if self.block is not None:
+            self.block.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        self.queries.append(query)
+        self.settings.append(settings)
+        self.written.set()
+        return ''
+
+def wait_for(db):
+    assert db.written.wait(5)
+    db.written.clear()
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+@pytest.fixture
+def connection(monkeypatch):
+    monkeypatch.setattr(connector, '_database_class', FakeDatabase)
+    return connector.Connection('default')
+
+
+def test_flush_on_max_rows(db):
+    with connector.BufferedWriter(db, max_rows=2, flush_interval=60) as writer:
+        writer.insert('t', [(1, 'a')])
+        assert not db.written.wait(0.1)
+        writer.insert('t', [(2, "b'c")])
+        wait_for(db)
+        assert db.queries == ["INSERT INTO t VALUES (1,'a'),(2,'b\\'c')"]
+        assert writer.stats['rows_written'] == 2
+        assert writer.stats['rows_pending'] == 0
+
+def test_flush_on_max_bytes(db):
+    with connector.BufferedWriter(db, max_bytes=10, flush_interval=60) as writer:
+        writer.insert('t', [('abc',)])
+        assert not db.written.wait(0.1)
+        writer.insert('t', [('defgh',)])
+        wait_for(db)
+        assert db.queries == ["INSERT INTO t VALUES ('abc'),('defgh')"]
+
+def test_flush_on_interval(db):
+    with connector.BufferedWriter(db, flush_interval=0.1) as writer:
+        start = time.time()
+        writer.insert('t', [(1,)])
+        wait_for(db)
+        assert time.time() - start >= 0.09
+        assert db.queries == ['INSERT INTO t VALUES (1)']
+
+def test_batches_per_table_and_columns(db):
+    with connector.BufferedWriter(db, flush_interval=60) as writer:
+        writer.insert('t', [{'a': 1, 'b': 2}, {'b': 4, 'a': 3}])
+        writer.insert('t', [(5,)], columns=['a'])
+        writer.insert('u', [(6,)])
+        writer.flush()
+        assert sorted(db.queries) == ['INSERT INTO t (a) VALUES (5)',
+                                      'INSERT INTO t (a, b) VALUES (1,2),(3,4)',
+                                      'INSERT INTO u VALUES (6)']
+
+def test_insert_blocks_when_buffer_is_full(db):
+    db.block = threading.Event()
+    with connector.BufferedWriter(db, flush_interval=60, buffer_rows=2) as writer:
+        writer.insert('t', [(1,), (2,)])
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (writer.insert('t', [(3,)]), done.set()))
+        thread.start()
+        # The flusher writes the full buffer out right away, but the write is still in progress
+        assert not done.wait(0.2)
+        db.block.set()
+        thread.join(5)
+        assert done.is_set()
+        assert db.queries == ['INSERT INTO t VALUES (1),(2)']
+        assert writer.stats['rows_pending'] == 1
+
+def test_insert_times_out_when_buffer_is_full(db):
+    db.block = threading.Event()
+    writer = connector.BufferedWriter(db, flush_interval=60, buffer_rows=2, timeout=0.1)
+    writer.insert('t', [(1,), (2,)])
+    start = time.time()
+    with pytest.raises(connector.Error):
+        writer.insert('t', [(3,)])
+    assert time.time() - start >= 0.09
+    db.block.set()
+    writer.close()
+    assert db.queries == ['INSERT INTO t VALUES (1),(2)']
+
+def test_close_flushes(db):
+    writer = connector.BufferedWriter(db, flush_interval=60)
+    writer.insert('t', [(1,)])
+    writer.close()
+    assert db.queries == ['INSERT INTO t VALUES (1)']
+    assert writer not in connector._open_writers
+    with pytest.raises(connector.Error):
+        writer.insert('t', [(2,)])
+
+def test_connection_close_flushes(connection):
+    writer = connection.buffered_writer(flush_interval=60)
+    writer.insert('t', [(1,)])
+    connection.close()
+    assert connection._database.queries == ['INSERT INTO t VALUES (1)']
+    assert connection._writers == []
+
+def test_connection_close_closes_all_writers(connection):
+    failing = connection.buffered_writer(flush_interval=60)
+    failing.insert('t', [(1,)])
+    other = connection.buffered_writer(flush_interval=60)
+    other.insert('u', [(2,)])
+    failing._connection = FakeDatabase()
+    failing._connection.fail = ValueError('boom')
+    with pytest.raises(ValueError):
+        connection.close()
+    assert connection._database.queries == ['INSERT INTO u VALUES (2)']
+    assert failing not in connector._open_writers
+    assert other not in connector._open_writers
+
+def test_on_error(db):
+    db.fail = ValueError('boom')
+    errors = []
+    with connector.BufferedWriter(db, max_rows=2, flush_interval=60,
+                                  on_error=lambda *args: (errors.append(args), db.written.set())) as writer:
+        writer.insert('t', [(1,), (2,)])
+        wait_for(db)
+        assert errors == [('t', ['(1)', '(2)'], db.fail)]
+        assert writer.stats['failures'] == 1
+        assert writer.stats['rows_pending'] == 0
+        # Explicit flushes raise the error as well
+        writer.insert('t', [(3,)])
+        with pytest.raises(ValueError):
+            writer.flush()
+        assert len(errors) == 2
+
+def test_on_flush(db):
+    flushed = []
+    with connector.BufferedWriter(db, flush_interval=60, on_flush=lambda *args: flushed.append(args)) as writer:
+        writer.insert('t', [(1,), (2,)])
+        writer.flush()
+    assert [(table, rows) for table, rows, latency in flushed] == [('t', 2)]
+    assert writer.stats['flushes'] == 1
+
+def test_async_insert(db):
+    db.server_version = (21, 11)
+    with connector.BufferedWriter(db, async_insert=True) as writer:
+        assert writer._thread is None
+        writer.insert('t', [(1,)])
+        assert db.queries == ['INSERT INTO t VALUES (1)']
+        assert db.settings == [{'async_insert': 1, 'wait_for_async_insert': 1}]
+
+def test_async_insert_falls_back_on_old_servers(db):
+    with connector.BufferedWriter(db, async_insert=True, flush_interval=60) as writer:
+        assert not writer.async_insert
+        writer.insert('t', [(1,)])
+        assert db.queries == []
+    assert db.settings == [None]